@@ -1,2 +1,3 @@
 from .binance_api import BinanceApi
 from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
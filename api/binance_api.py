@@ -1,178 +1,310 @@
+import asyncio
 from collections.abc import Coroutine
 from aiohttp import ClientSession
-import time
-from typing import Any, Set
+from typing import Any, Callable, Dict, Tuple
 from util import (
     add_signature,
     determine_timestamp_now,
-    determine_timestamp_start_time,
+    hash_values,
 )
 from constant import (
+    ACCOUNT_URL,
     AUTO_INVEST_HISTORY_URL,
     AVG_PRICE_URL,
     CONVERT_TRADE_FLOW_URL,
+    EXCHANGE_INFO_URL,
+    KLINES_LIMIT,
+    KLINES_URL,
+    MY_TRADES_LIMIT,
     MY_TRADES_URL,
+    SETTLEMENT_LAG,
 )
-import requests
+from .response_cache import ResponseCache
 
 
 class BinanceApi:
     def __init__(
-        self, api_key: str, api_secret: str, session: ClientSession
+        self,
+        api_key: str,
+        api_secret: str,
+        session: ClientSession | None,
+        response_cache: ResponseCache | None = None,
     ) -> None:
         self.headers = {"X-MBX-APIKEY": api_key}
         self.api_secret = api_secret
         self.session = session
+        self.response_cache = response_cache
+        self.account = hash_values([api_key]).hex()
 
     async def get_auto_invest_tx(
         self, start_time: int, end_time: int
     ) -> Coroutine[Any, Any, Any]:
-        timestamp = determine_timestamp_now()
+        status, data = await self._get(
+            AUTO_INVEST_HISTORY_URL,
+            self._auto_invest_params(start_time, end_time),
+            end_time,
+            signed=True,
+        )
 
-        params = {
-            "size": 100,
-            "timestamp": timestamp,
-            "startTime": start_time,
-            "endTime": end_time,
-        }
+        if status != 200:
+            print(status, data["msg"])
 
-        add_signature(params, self.api_secret)
+            if data["code"] == -1021:
+                return self.get_auto_invest_tx(start_time, end_time)
 
-        async with self.session.get(
-            AUTO_INVEST_HISTORY_URL, headers=self.headers, params=params
-        ) as response:
-            if response.status != 200:
-                data = await response.json()
+            return Coroutine()
+
+        return data
 
-                print(response.status, data["msg"])
+    async def get_avg_price(self, symbol: str) -> Coroutine[Any, Any, Any]:
+        params = {"symbol": symbol}
 
-                if data["code"] == -1021:
-                    return self.get_auto_invest_tx(start_time, end_time)
+        status, data = await self._get(AVG_PRICE_URL, params)
 
-                return Coroutine()
+        if status != 200:
+            print(status, data["msg"])
+            return Coroutine()
 
-            return await response.json()
+        return data
 
-    async def get_avg_price(self, symbol: str) -> Coroutine[Any, Any, Any]:
-        params = {"symbol": symbol}
+    async def get_klines(
+        self, symbol: str, interval: str, start_time: int, end_time: int
+    ) -> list | None:
+        status, data = await self._get(
+            KLINES_URL,
+            self._klines_params(symbol, interval, start_time, end_time),
+            end_time,
+        )
 
-        async with self.session.get(
-            AVG_PRICE_URL, headers=self.headers, params=params
-        ) as response:
-            if response.status != 200:
-                data = await response.json()
-                print(response.status, data["msg"])
-                return Coroutine()
+        if status != 200:
+            print(status, symbol, data["msg"])
+
+            # The pair does not exist, so there is nothing to backfill.
+            if data["code"] == -1121:
+                return []
+
+            return None
 
-            return await response.json()
+        return data
 
     async def get_convert_tx(
         self, start_time: int, end_time: int
     ) -> Coroutine[Any, Any, Any]:
-        timestamp = determine_timestamp_now()
+        status, data = await self._get(
+            CONVERT_TRADE_FLOW_URL,
+            self._convert_params(start_time, end_time),
+            end_time,
+            signed=True,
+        )
 
-        params = {
-            "limit": 1000,
-            "timestamp": timestamp,
-            "startTime": start_time,
-            "endTime": end_time,
-        }
+        if status != 200:
+            print(status, data["msg"])
 
-        add_signature(params, self.api_secret)
+            if data["code"] == -1021:
+                await self.get_convert_tx(start_time, end_time)
 
-        async with self.session.get(
-            CONVERT_TRADE_FLOW_URL, headers=self.headers, params=params
-        ) as response:
-            if response.status != 200:
-                data = await response.json()
+            return Coroutine()
 
-                print(response.status, data["msg"])
+        return data
 
-                if data["code"] == -1021:
-                    await self.get_convert_tx(start_time, end_time)
+    async def get_spot_tx(self, symbol: str, from_id: int) -> list | None:
+        status, data = await self._get(
+            MY_TRADES_URL,
+            self._spot_params(symbol, from_id),
+            signed=True,
+            is_final=self._is_final_spot_page,
+        )
 
-                return Coroutine()
+        if status != 200:
+            print(status, symbol, data["msg"])
+            return None
 
-            return await response.json()
+        return data
 
-    def get_spot_tx(
-        self,
-        connection,
-        hashed_txs: Set[bytes],
-        symbol: str,
-        period: int,
-        days_interval: int,
-        end_time: int | None = None,
-    ):
-        if period == 0:
-            return
+    async def get_exchange_info(self) -> dict | None:
+        status, data = await self._get(EXCHANGE_INFO_URL, {})
 
-        timestamp = determine_timestamp_now()
+        if status != 200:
+            print(status, data["msg"])
+            return None
 
-        if not end_time:
-            end_time = timestamp
+        return data
 
-        start_time = determine_timestamp_start_time(end_time, days_interval)
+    async def get_account(self) -> dict | None:
+        params = {"omitZeroBalances": "true"}
 
-        params = {
-            "limit": 1000,
+        status, data = await self._get(ACCOUNT_URL, params, signed=True)
+
+        if status != 200:
+            print(status, data["msg"])
+            return None
+
+        return data
+
+    # The is_*_cached methods tell whether the matching get_* call will be
+    # served from the response cache, so it is not charged to a rate limit.
+
+    async def is_auto_invest_tx_cached(
+        self, start_time: int, end_time: int
+    ) -> bool:
+        return await self._is_cached(
+            AUTO_INVEST_HISTORY_URL,
+            self._auto_invest_params(start_time, end_time),
+            end_time,
+            signed=True,
+        )
+
+    async def is_klines_cached(
+        self, symbol: str, interval: str, start_time: int, end_time: int
+    ) -> bool:
+        return await self._is_cached(
+            KLINES_URL,
+            self._klines_params(symbol, interval, start_time, end_time),
+            end_time,
+        )
+
+    async def is_convert_tx_cached(
+        self, start_time: int, end_time: int
+    ) -> bool:
+        return await self._is_cached(
+            CONVERT_TRADE_FLOW_URL,
+            self._convert_params(start_time, end_time),
+            end_time,
+            signed=True,
+        )
+
+    async def is_spot_tx_cached(self, symbol: str, from_id: int) -> bool:
+        return await self._is_cached(
+            MY_TRADES_URL,
+            self._spot_params(symbol, from_id),
+            signed=True,
+            is_final=self._is_final_spot_page,
+        )
+
+    @staticmethod
+    def _auto_invest_params(start_time: int, end_time: int) -> Dict:
+        return {
+            "size": 100,
+            "startTime": start_time,
+            "endTime": end_time,
+        }
+
+    @staticmethod
+    def _klines_params(
+        symbol: str, interval: str, start_time: int, end_time: int
+    ) -> Dict:
+        return {
             "symbol": symbol,
-            "timestamp": timestamp,
+            "interval": interval,
             "startTime": start_time,
             "endTime": end_time,
+            "limit": KLINES_LIMIT,
         }
 
-        add_signature(params, self.api_secret)
+    @staticmethod
+    def _convert_params(start_time: int, end_time: int) -> Dict:
+        return {
+            "limit": 1000,
+            "startTime": start_time,
+            "endTime": end_time,
+        }
+
+    @staticmethod
+    def _spot_params(symbol: str, from_id: int) -> Dict:
+        return {
+            "symbol": symbol,
+            "fromId": from_id,
+            "limit": MY_TRADES_LIMIT,
+        }
 
-        response = requests.get(
-            MY_TRADES_URL, headers=self.headers, params=params
+    @staticmethod
+    def _is_final_spot_page(trades: list) -> bool:
+        # Only a full page whose trades are all settled can no longer change.
+        return (
+            len(trades) == MY_TRADES_LIMIT
+            and trades[-1]["time"]
+            < determine_timestamp_now() - SETTLEMENT_LAG
         )
 
-        data = response.json()
-
-        print(period)
-        if response.status_code != 200:
-            print(response.status_code, data["msg"])
-            self.get_spot_tx(
-                connection,
-                hashed_txs,
-                symbol,
-                period,
-                days_interval,
-                start_time,
+    def _cache_key(
+        self,
+        url: str,
+        params: Dict,
+        end_time: int | None,
+        signed: bool,
+        is_final: Callable[[Any], bool] | None,
+    ) -> str | None:
+        """
+        Returns the response cache key of a request, or None when its
+        response may still change and is never cached.
+        """
+        if not self.response_cache or (
+            is_final is None
+            and (
+                end_time is None
+                or end_time >= determine_timestamp_now() - SETTLEMENT_LAG
             )
+        ):
+            return None
 
-        time.sleep(0.5)
-
-        # if data:
-        # print(json.dumps(data))
-        # transactions = []
-        # for tx in data:
-        #     print(json.dumps(tx))
-        # tx_info = create_tx_info(
-        #     tx["orderId"],
-        #     tx["createTime"],
-        #     tx["fromAsset"],
-        #     tx["fromAmount"],
-        #     tx["toAsset"],
-        #     tx["toAmount"],
-        #     tx["ratio"],
-        #     None,
-        #     "SELL",
-        # )
-
-        #     hashed_tx = hash_values(tx_info.values())
-        #     if hashed_tx in hashed_txs:
-        #         continue
-
-        #     hashed_txs.add(hashed_tx)
-        #     transactions.append(tx_info)
-
-        # inset_transactions(connection, transactions)
-
-        period -= days_interval
-        days_interval = days_interval if period > days_interval else period
-
-        self.get_spot_tx(
-            connection, hashed_txs, symbol, period, days_interval, start_time
-        )
+        return ResponseCache.key(url, params, self.account if signed else "")
+
+    async def _is_cached(
+        self,
+        url: str,
+        params: Dict,
+        end_time: int | None = None,
+        signed: bool = False,
+        is_final: Callable[[Any], bool] | None = None,
+    ) -> bool:
+        cache_key = self._cache_key(url, params, end_time, signed, is_final)
+
+        if not cache_key:
+            return False
+
+        return await asyncio.to_thread(self.response_cache.contains, cache_key)
+
+    async def _get(
+        self,
+        url: str,
+        params: Dict,
+        end_time: int | None = None,
+        signed: bool = False,
+        is_final: Callable[[Any], bool] | None = None,
+    ) -> Tuple[int, Any]:
+        """
+        Sends a GET request and returns its status and JSON data.
+
+        Responses of windows that ended more than SETTLEMENT_LAG ago can no
+        longer change, so they are served from the response cache when
+        present and saved to it otherwise. Requests without a window can
+        pass is_final instead, only the responses it accepts are saved.
+        """
+        cache_key = self._cache_key(url, params, end_time, signed, is_final)
+
+        if cache_key:
+            data = await asyncio.to_thread(self.response_cache.get, cache_key)
+
+            if data is not None:
+                return 200, data
+
+        if signed:
+            params = {**params, "timestamp": determine_timestamp_now()}
+            add_signature(params, self.api_secret)
+
+        async with self.session.get(
+            url, headers=self.headers, params=params
+        ) as response:
+            data = await response.json()
+
+            if (
+                response.status == 200
+                and cache_key
+                and (is_final is None or is_final(data))
+            ):
+                # Saved in the background, the request does not wait on it.
+                asyncio.get_running_loop().run_in_executor(
+                    None, self.response_cache.put, cache_key, data
+                )
+
+            return response.status, data
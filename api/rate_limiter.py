@@ -20,7 +20,16 @@ class RateLimiter:
             or current_time - self.last_execution_time >= self.time_window
         ):
             await self.execute_tasks()
-            self.last_execution_time = current_time
+
+            # The weight budget of this window is used up, wait for the next.
+            if self.current_weight + weight > self.rate_limit:
+                remaining_time = self.time_window - (
+                    time() - self.last_execution_time
+                )
+                if remaining_time > 0:
+                    await asyncio.sleep(remaining_time)
+
+            self.last_execution_time = time()
             self.current_weight = 0
 
         self.tasks.append(task)
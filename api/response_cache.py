@@ -0,0 +1,60 @@
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from constant import RESPONSE_CACHE_DIR
+from util import hash_values
+
+# Parameters that change on every request without changing the response
+VOLATILE_PARAMS = ("timestamp", "signature")
+
+
+class ResponseCache:
+    """
+    Archive of raw API responses of closed time windows, which can no longer
+    change. Every response is stored gzip compressed, in a file named after
+    the hash of its endpoint, parameters and account.
+    """
+
+    def __init__(self, directory: str = RESPONSE_CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(url: str, params: Dict, account: str = "") -> str:
+        values = [
+            url,
+            account,
+            *(
+                f"{key}={value}"
+                for key, value in sorted(params.items())
+                if key not in VOLATILE_PARAMS
+            ),
+        ]
+
+        return hash_values(values).hex()
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with gzip.open(self._path(key), "rt") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def put(self, key: str, data: Any):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so a crash never leaves a
+        # truncated response behind.
+        temporary_path = path.with_suffix(".tmp")
+        with gzip.open(temporary_path, "wt") as file:
+            json.dump(data, file)
+
+        temporary_path.replace(path)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
@@ -0,0 +1,309 @@
+import asyncio
+from argparse import ArgumentParser
+import contextlib
+from datetime import datetime
+from decimal import Decimal
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bench.generate_ledger import generate_transactions, write_transactions
+from db import database
+from db.storage import Storage
+from service import CalculationService
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+# Results are only compared with previous ones of the same settings.
+RESULT_SETTINGS = ("rows", "assets", "skew", "buy_ratio", "insert_rows")
+
+
+class StubPriceService:
+    """
+    Price provider that answers without any request, so only the
+    calculation itself is timed.
+    """
+
+    async def get_asset_usdt_average_price(self, asset: str) -> Decimal:
+        return Decimal(1)
+
+
+async def _measure(
+    fn: Callable[[], Awaitable],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> Dict:
+    """
+    Times repeat runs of fn and keeps the minimum and the median, as a
+    single sample is too noisy to compare. One more run under tracemalloc
+    records the peak Python memory, as tracing slows the run down.
+    SQLite's own allocations are not included in the peak.
+    """
+    samples = []
+
+    for _ in range(repeat):
+        if setup:
+            setup()
+
+        start = perf_counter()
+        await fn()
+        samples.append(perf_counter() - start)
+
+    if setup:
+        setup()
+
+    tracemalloc.start()
+    try:
+        await fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": min(samples),
+        "median_seconds": statistics.median(samples),
+        "peak_memory_bytes": peak,
+    }
+
+
+async def run_benchmarks(rows: int, args) -> List[Dict]:
+    """
+    Streams a ledger of the given size into a scratch database once, then
+    times the reads and calculation over the whole ledger and inserting
+    batches of insert_rows new transactions into it.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "ledger.db"))
+
+        try:
+            await storage.write(database.init_db)
+            await write_transactions(
+                storage,
+                generate_transactions(
+                    rows, args.assets, args.skew, args.buy_ratio
+                ),
+            )
+
+            results = await _run_benchmarks(storage, rows, args)
+        finally:
+            await storage.close()
+
+    revision = _git_revision()
+    date = datetime.now().isoformat(timespec="seconds")
+
+    return [
+        {
+            "revision": revision,
+            "date": date,
+            "python": platform.python_version(),
+            "rows": rows,
+            "assets": args.assets,
+            "skew": args.skew,
+            "buy_ratio": args.buy_ratio,
+            "insert_rows": args.insert_rows,
+            "benchmark": name,
+            "operation_rows": operation_rows,
+            "rows_per_second": operation_rows / result["seconds"],
+            **result,
+        }
+        for name, (operation_rows, result) in results.items()
+    ]
+
+
+async def _run_benchmarks(storage: Storage, rows: int, args) -> Dict:
+    insert_rows = min(args.insert_rows, rows)
+    batch: List = []
+    first_id = rows
+
+    def generate_batch():
+        # New ids every run, so every run really inserts.
+        nonlocal batch, first_id
+        batch = list(
+            generate_transactions(
+                insert_rows,
+                args.assets,
+                args.skew,
+                args.buy_ratio,
+                seed=first_id,
+                first_id=first_id,
+            )
+        )
+        first_id += insert_rows
+
+    async def insert():
+        await write_transactions(storage, iter(batch))
+
+    calculation_service = CalculationService(StubPriceService(), storage)
+
+    async def calculate_average_prices():
+        with contextlib.redirect_stdout(io.StringIO()):
+            await calculation_service.calculate_average_prices()
+
+    benchmarks = {
+        "get_all_transactions": lambda: storage.read(
+            database.get_all_transactions
+        ),
+        "get_all_unique_assets": lambda: storage.read(
+            database.get_all_unique_assets
+        ),
+        "calculate_average_prices": calculate_average_prices,
+    }
+
+    results = {}
+
+    for name, fn in benchmarks.items():
+        results[name] = (rows, await _measure(fn, args.repeat))
+
+    # Last, as every run grows the ledger the other benchmarks read.
+    results["insert"] = (
+        insert_rows,
+        await _measure(insert, args.repeat, generate_batch),
+    )
+
+    return results
+
+
+def find_regressions(
+    results: List[Dict], previous_results: List[Dict], threshold: float
+) -> List[str]:
+    """
+    Compares every result with the latest previous one of the same
+    benchmark and RESULT_SETTINGS.
+    """
+    latest: Dict[tuple, Dict] = {}
+
+    for result in previous_results:
+        latest[_result_key(result)] = result
+
+    regressions = []
+
+    for result in results:
+        previous = latest.get(_result_key(result))
+        if not previous:
+            continue
+
+        for metric in ("seconds", "peak_memory_bytes"):
+            ratio = result[metric] / max(previous[metric], 1e-9)
+
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{result['benchmark']} ({result['rows']} rows) {metric}:"
+                    f" {ratio:.2f}x of {previous['revision']}"
+                )
+
+    return regressions
+
+
+def _result_key(result: Dict) -> tuple:
+    # Results saved before a setting was recorded have None for it.
+    return (
+        result["benchmark"],
+        *(result.get(setting) for setting in RESULT_SETTINGS),
+    )
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _read_results(path: str) -> List[Dict]:
+    try:
+        with open(path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _print_results(results: List[Dict]):
+    print(
+        f"{'benchmark':<26}{'ledger':>10}{'rows':>10}{'time (s)':>11}"
+        f"{'rows/s':>13}{'peak (MB)':>11}"
+    )
+
+    for result in results:
+        print(
+            f"{result['benchmark']:<26}{result['rows']:>10}"
+            f"{result['operation_rows']:>10}{result['seconds']:>11.3f}"
+            f"{result['rows_per_second']:>13.0f}"
+            f"{result['peak_memory_bytes'] / 2**20:>11.1f}"
+        )
+
+
+async def main() -> Optional[int]:
+    parser = ArgumentParser(
+        description="Benchmark the storage and calculation hot paths"
+    )
+    parser.add_argument(
+        "-n", "--rows", type=int, nargs="+", default=[10000, 100000]
+    )
+    parser.add_argument("-a", "--assets", type=int, default=100)
+    parser.add_argument("--skew", type=float, default=1.2)
+    parser.add_argument("--buy-ratio", type=float, default=0.7)
+    parser.add_argument(
+        "--insert-rows",
+        type=int,
+        default=100000,
+        help="Rows inserted into the ledger by the insert benchmark",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=5,
+        help="Timed runs of every benchmark, the fastest is kept",
+    )
+    parser.add_argument("-o", "--output", type=str, default=RESULTS_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help=(
+            "Relative slowdown of the fastest run reported as a regression"
+            " (default: 0.2)"
+        ),
+    )
+    parser.add_argument(
+        "--no-save",
+        action="store_true",
+        help="Do not append the results to the output file",
+    )
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        results.extend(await run_benchmarks(rows, args))
+
+    _print_results(results)
+
+    regressions = find_regressions(
+        results, _read_results(args.output), args.threshold
+    )
+    for regression in regressions:
+        print(f"Regression: {regression}")
+
+    if not args.no_save:
+        with open(args.output, "a") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+    return 1 if regressions else None
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,154 @@
+import asyncio
+from argparse import ArgumentParser
+from collections import deque
+from decimal import Decimal
+from itertools import accumulate
+import random
+from typing import Iterator, List
+
+from db import database
+from db.storage import Storage
+from model import Transaction
+from util import determine_timestamp_now
+
+DAY_MS = 24 * 60 * 60 * 1000
+CHUNK_SIZE = 10000
+MAX_PENDING_CHUNKS = 4
+
+
+def generate_transactions(
+    count: int,
+    asset_count: int = 100,
+    skew: float = 1.2,
+    buy_ratio: float = 0.7,
+    days: int = 5 * 365,
+    seed: int = 0,
+    first_id: int = 0,
+) -> Iterator[Transaction]:
+    """
+    Generates synthetic auto-invest BUY and convert SELL transactions
+    against USDT.
+
+    :param count: Number of transactions.
+    :param asset_count: Number of distinct assets.
+    :param skew: Zipf exponent of the asset popularity, 0 for uniform.
+    :param buy_ratio: Share of BUY transactions.
+    :param days: Number of days of history the transactions are spread over.
+    :param seed: Seed of the random generator.
+    :param first_id: binance_id of the first transaction.
+    :return: The transactions, in no particular order.
+    """
+    rng = random.Random(seed)
+
+    assets = [f"A{index}" for index in range(asset_count)]
+    # Cumulative weights, so choices does not rebuild them for every row.
+    cum_weights = list(
+        accumulate(1 / (rank + 1) ** skew for rank in range(asset_count))
+    )
+    prices = {asset: 10 ** rng.uniform(-2, 4) for asset in assets}
+
+    end_time = determine_timestamp_now()
+    start_time = end_time - days * DAY_MS
+
+    for index in range(first_id, first_id + count):
+        asset = rng.choices(assets, cum_weights=cum_weights)[0]
+        timestamp = rng.randint(start_time, end_time)
+        price = prices[asset] * rng.uniform(0.5, 1.5)
+        usd_amount = rng.lognormvariate(3, 1)
+        asset_amount = usd_amount / price
+
+        if rng.random() < buy_ratio:
+            yield Transaction(
+                binance_id=str(index),
+                timestamp=timestamp,
+                s_asset="USDT",
+                s_amount=Decimal(f"{usd_amount:.8f}"),
+                b_asset=asset,
+                b_amount=Decimal(f"{asset_amount:.8f}"),
+                price=Decimal(f"{price:.8f}"),
+                tx_type="BUY",
+                fee=Decimal(f"{usd_amount * 0.001:.8f}"),
+            )
+        else:
+            yield Transaction(
+                binance_id=str(index),
+                timestamp=timestamp,
+                s_asset=asset,
+                s_amount=Decimal(f"{asset_amount:.8f}"),
+                b_asset="USDT",
+                b_amount=Decimal(f"{usd_amount:.8f}"),
+                price=Decimal(f"{1 / price:.8f}"),
+                tx_type="SELL",
+            )
+
+
+async def write_transactions(
+    storage: Storage, transactions: Iterator[Transaction]
+):
+    """
+    Writes the transactions in chunks of CHUNK_SIZE through the storage
+    writer, the same path a sync uses. At most MAX_PENDING_CHUNKS chunks
+    are queued at a time, so a streamed ledger of any size fits in memory.
+    """
+    chunk: List[Transaction] = []
+    pending = deque()
+
+    for transaction in transactions:
+        chunk.append(transaction)
+
+        if len(chunk) == CHUNK_SIZE:
+            pending.append(
+                storage.submit(database.inset_new_transactions, chunk)
+            )
+            chunk = []
+
+            if len(pending) >= MAX_PENDING_CHUNKS:
+                await pending.popleft()
+
+    if chunk:
+        storage.submit(database.inset_new_transactions, chunk)
+
+    await storage.flush()
+
+
+async def main():
+    parser = ArgumentParser(
+        description="Write a synthetic ledger into a scratch database"
+    )
+    parser.add_argument("-o", "--output", type=str, default="scratch.db")
+    parser.add_argument("-n", "--count", type=int, default=100000)
+    parser.add_argument("-a", "--assets", type=int, default=100)
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.2,
+        help="Zipf exponent of the asset popularity, 0 for uniform",
+    )
+    parser.add_argument("--buy-ratio", type=float, default=0.7)
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    storage = Storage(args.output)
+    await storage.write(database.init_db)
+
+    try:
+        await write_transactions(
+            storage,
+            generate_transactions(
+                args.count,
+                args.assets,
+                args.skew,
+                args.buy_ratio,
+                args.days,
+                args.seed,
+            ),
+        )
+    finally:
+        await storage.close()
+
+    print(f"Wrote {args.count} transactions to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,102 @@
-from typing import Tuple
+from argparse import ArgumentParser, Namespace
+from constant import KLINES_INTERVALS
 from util import determine_period, determine_days_interval, str_to_datetime
-from argparse import ArgumentParser
 
 
-def args_parser() -> Tuple[int, int] | None:
+def args_parser() -> Namespace:
     parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
 
+    sync_parser = subparsers.add_parser(
+        "sync", help="Download the transactions and the price history"
+    )
+    _add_sync_arguments(sync_parser)
+
+    sync_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the request plan, the same as the plan command",
+    )
+
+    plan_parser = subparsers.add_parser(
+        "plan",
+        help=(
+            """
+            Estimate the requests, rate limit weight and time of a sync
+            without making any requests
+            """
+        ),
+    )
+    _add_sync_arguments(plan_parser)
+
+    report_parser = subparsers.add_parser(
+        "report", help="Print the average prices and potential profit/loss"
+    )
+
+    report_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the locally stored prices instead of the current ones",
+    )
+
+    report_parser.add_argument(
+        "--at",
+        type=str,
+        help=(
+            """
+            Value the holdings at the end of this date (DD/MM/YYYY)
+            using the locally stored prices
+            """
+        ),
+    )
+
+    _add_klines_interval_argument(
+        report_parser,
+        """
+        The interval of the stored price history used by --offline and
+        --at, as downloaded with sync -k (default: 1d)
+        """,
+    )
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export the daily value of every asset to a CSV file"
+    )
+
+    export_parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="portfolio.csv",
+        help="The path of the CSV file (default: portfolio.csv)",
+    )
+
+    _add_klines_interval_argument(
+        export_parser,
+        """
+        The interval of the stored price history, as downloaded with
+        sync -k; the last close of every day is used (default: 1d)
+        """,
+    )
+
+    args = parser.parse_args()
+
+    if args.command in ("sync", "plan"):
+        start_date = str_to_datetime(args.date)
+        args.period = determine_period(start_date)
+        # Starting today gives a period of 0 days, windows are at least 1.
+        args.days_interval = max(
+            determine_days_interval(args.interval, args.period), 1
+        )
+
+    return args
+
+
+def _add_sync_arguments(parser: ArgumentParser):
     parser.add_argument(
         "-d",
         "--date",
         type=str,
+        required=True,
         help="The date from which to start tracking transaction (DD/MM/YYYY)",
     )
 
@@ -25,10 +112,29 @@ def args_parser() -> Tuple[int, int] | None:
         ),
     )
 
-    args = parser.parse_args()
+    _add_klines_interval_argument(
+        parser, "The interval of the downloaded price history (default: 1d)"
+    )
 
-    if args.date:
-        start_date = str_to_datetime(args.date)
-        period = determine_period(start_date)
-        days_interval = determine_days_interval(args.interval, period)
-        return (period, days_interval)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.5,
+        help=(
+            """
+            The expected time in seconds of a batch of requests, used by
+            the plan to project the duration (default: 0.5)
+            """
+        ),
+    )
+
+
+def _add_klines_interval_argument(parser: ArgumentParser, help: str):
+    parser.add_argument(
+        "-k",
+        "--klines-interval",
+        type=str,
+        default="1d",
+        choices=KLINES_INTERVALS,
+        help=help,
+    )
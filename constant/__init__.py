@@ -1,2 +1,3 @@
+from .cache import *
 from .urls import *
 from .weights import *
@@ -0,0 +1,8 @@
+RESPONSE_CACHE_DIR = "responses"
+
+# Time after which a closed window of the account history no longer changes
+SETTLEMENT_LAG = 24 * 60 * 60 * 1000
+
+EXCHANGE_INFO_CACHE_PATH = "exchange_info.json"
+# Seconds after which the cached exchange info is downloaded again
+EXCHANGE_INFO_TTL = 24 * 60 * 60
@@ -5,3 +5,6 @@ AUTO_INVEST_HISTORY_URL = (
 CONVERT_TRADE_FLOW_URL = f"{BASE_URL}/sapi/v1/convert/tradeFlow"
 MY_TRADES_URL = f"{BASE_URL}/api/v3/myTrades"
 AVG_PRICE_URL = f"{BASE_URL}/api/v3/avgPrice"
+KLINES_URL = f"{BASE_URL}/api/v3/klines"
+EXCHANGE_INFO_URL = f"{BASE_URL}/api/v3/exchangeInfo"
+ACCOUNT_URL = f"{BASE_URL}/api/v3/account"
@@ -2,6 +2,28 @@
 API_RATE_LIMIT = 6000
 AVG_PRICE_WEIGHT_IP = 2
 MY_TRADES_WEIGHT_IP = 20
+MY_TRADES_LIMIT = 1000
+KLINES_WEIGHT_IP = 2
+KLINES_LIMIT = 1000
+# Kline intervals whose candles open on multiples of their length since
+# the epoch. 3d, 1w (weeks open on Monday) and 1M are left out.
+KLINES_INTERVALS = (
+    "1s",
+    "1m",
+    "3m",
+    "5m",
+    "15m",
+    "30m",
+    "1h",
+    "2h",
+    "4h",
+    "6h",
+    "8h",
+    "12h",
+    "1d",
+)
+EXCHANGE_INFO_WEIGHT_IP = 20
+ACCOUNT_WEIGHT_IP = 20
 
 # /sapi/*
 SAPI_IP_RATE_LIMIT = 12000
@@ -1,28 +1,36 @@
+from bisect import bisect_right
+from decimal import Decimal
+from pathlib import Path
 import sqlite3
 from sqlite3 import Connection
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from model import Transaction
+from model import Kline, Transaction
+from util import merge_ranges
 
-db_connection: Optional[Connection] = None
+DB_PATH = "tx.db"
 
 
-def _get_db_connection() -> Connection:
+def connect(path: str = DB_PATH, read_only: bool = False) -> Connection:
     """
-    Returns a singleton SQLite connection.
-    If the connection does not exist, it is created.
+    Opens a new SQLite connection. Connections are not shared between
+    threads, every thread of the storage layer opens its own.
+    Writes are not committed by the functions of this module, the owner of
+    the write connection commits them in batches.
     """
-    global db_connection
+    if read_only:
+        uri = f"{Path(path).absolute().as_uri()}?mode=ro"
+        connection = sqlite3.connect(uri, uri=True)
+    else:
+        connection = sqlite3.connect(path)
+        connection.execute("pragma journal_mode=wal")
 
-    if not db_connection:
-        db_connection = sqlite3.connect("tx.db")
-        db_connection.row_factory = sqlite3.Row
+    connection.row_factory = sqlite3.Row
 
-    return db_connection
+    return connection
 
 
-def init_db():
-    connection = _get_db_connection()
+def init_db(connection: Connection):
     cursur = connection.cursor()
     try:
         cursur.execute(
@@ -42,14 +50,122 @@ def init_db():
             );
             """
         )
+        cursur.execute(
+            """
+            create table if not exists klines
+            (
+                symbol text,
+                interval text,
+                open_time int,
+                close_time int,
+                open text,
+                high text,
+                low text,
+                close text,
+                volume text,
+                primary key (symbol, interval, open_time)
+            );
+            """
+        )
+        cursur.execute(
+            """
+            create index if not exists klines_close_time
+            on klines (symbol, interval, close_time);
+            """
+        )
+        cursur.execute(
+            """
+            create table if not exists kline_ranges
+            (
+                symbol text,
+                interval text,
+                start_time int,
+                end_time int,
+                primary key (symbol, interval, start_time)
+            );
+            """
+        )
+        _init_daily_amount_changes(cursur)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
     finally:
         cursur.close()
 
 
-def inset_new_transactions(transactions: Iterable[Transaction]):
-    connection = _get_db_connection()
+def _init_daily_amount_changes(cursor: sqlite3.Cursor):
+    """
+    Keeps the net balance change of every asset per day as numbers, so
+    reading them does not have to parse and group the whole ledger.
+    Transactions ignored as duplicates do not fire the trigger, so they are
+    not counted twice.
+    """
+    cursor.execute(
+        """
+        create table if not exists daily_amount_changes
+        (
+            day int,
+            asset text,
+            amount real,
+            primary key (day, asset)
+        );
+        """
+    )
+    cursor.execute(
+        """
+        create trigger if not exists transactions_daily_amount_changes
+        after insert on transactions
+        begin
+            insert into daily_amount_changes (day, asset, amount)
+            values (
+                new.timestamp / 86400000,
+                new.b_asset,
+                cast(new.b_amount as real)
+            )
+            on conflict (day, asset)
+            do update set amount = amount + excluded.amount;
+
+            insert into daily_amount_changes (day, asset, amount)
+            values (
+                new.timestamp / 86400000,
+                new.s_asset,
+                -(cast(new.s_amount as real) + cast(new.fee as real))
+            )
+            on conflict (day, asset)
+            do update set amount = amount + excluded.amount;
+        end;
+        """
+    )
+
+    # Databases created before the table existed are filled once.
+    cursor.execute("select exists (select 1 from daily_amount_changes)")
+    if cursor.fetchone()[0]:
+        return
+
+    cursor.execute(
+        """
+        insert into daily_amount_changes (day, asset, amount)
+        select c.day, c.asset, sum(c.amount)
+        from (
+            select
+                t.timestamp / 86400000 as day,
+                t.b_asset as asset,
+                cast(t.b_amount as real) as amount
+            from transactions as t
+            union all
+            select
+                t2.timestamp / 86400000 as day,
+                t2.s_asset as asset,
+                -(cast(t2.s_amount as real) + cast(t2.fee as real))
+            from transactions as t2
+        ) as c
+        group by c.day, c.asset
+        """
+    )
+
+
+def inset_new_transactions(
+    connection: Connection, transactions: Iterable[Transaction]
+):
     cursur = connection.cursor()
     try:
         cursur.executemany(
@@ -81,15 +197,13 @@ def inset_new_transactions(transactions: Iterable[Transaction]):
             """,
             (transaction.to_db_row() for transaction in transactions),
         )
-        connection.commit()
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
     finally:
         cursur.close()
 
 
-def get_all_transactions() -> List[Transaction]:
-    connection = _get_db_connection()
+def get_all_transactions(connection: Connection) -> List[Transaction]:
     cursor = connection.cursor()
     try:
         cursor.execute("select * from transactions")
@@ -102,8 +216,7 @@ def get_all_transactions() -> List[Transaction]:
         cursor.close()
 
 
-def get_all_unique_assets() -> List[str]:
-    connection = _get_db_connection()
+def get_all_unique_assets(connection: Connection) -> List[str]:
     cursor = connection.cursor()
     try:
         cursor.execute(
@@ -122,3 +235,210 @@ def get_all_unique_assets() -> List[str]:
         return []
     finally:
         cursor.close()
+
+
+def get_first_transaction_timestamp(
+    connection: Connection,
+) -> Optional[int]:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("select min(timestamp) from transactions")
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def insert_klines(connection: Connection, klines: Iterable[Kline]):
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(
+            """
+            insert or replace into klines
+            (
+                symbol,
+                interval,
+                open_time,
+                close_time,
+                open,
+                high,
+                low,
+                close,
+                volume
+            )
+            values (?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """,
+            (kline.to_db_row() for kline in klines),
+        )
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+    finally:
+        cursor.close()
+
+
+def get_kline_ranges(
+    connection: Connection, symbol: str, interval: str
+) -> List[Tuple[int, int]]:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            select start_time, end_time
+            from kline_ranges
+            where symbol = ? and interval = ?
+            order by start_time
+            """,
+            (symbol, interval),
+        )
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
+    finally:
+        cursor.close()
+
+
+def add_kline_ranges(
+    connection: Connection,
+    symbol: str,
+    interval: str,
+    ranges: Iterable[Tuple[int, int]],
+):
+    """
+    Adds newly fetched ranges to the covered ranges of a symbol/interval
+    pair, merging them with the ones already stored.
+    """
+    ranges = merge_ranges(
+        get_kline_ranges(connection, symbol, interval) + list(ranges)
+    )
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "delete from kline_ranges where symbol = ? and interval = ?",
+            (symbol, interval),
+        )
+        cursor.executemany(
+            """
+            insert into kline_ranges (symbol, interval, start_time, end_time)
+            values (?, ?, ?, ?);
+            """,
+            ((symbol, interval, start, end) for start, end in ranges),
+        )
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+    finally:
+        cursor.close()
+
+
+def get_prices_at(
+    connection: Connection,
+    symbol: str,
+    interval: str,
+    timestamps: Iterable[int],
+) -> Dict[int, Decimal]:
+    """
+    Returns the last known close price of a symbol at each of the given
+    timestamps, i.e. the close of the latest candle that closed at or
+    before the timestamp. Timestamps without a stored candle are omitted.
+    """
+    timestamps = sorted(set(timestamps))
+    if not timestamps:
+        return {}
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            select close_time, close
+            from klines
+            where symbol = :symbol
+                and interval = :interval
+                and close_time <= :last
+                and close_time >= coalesce(
+                    (
+                        select max(close_time)
+                        from klines
+                        where symbol = :symbol
+                            and interval = :interval
+                            and close_time <= :first
+                    ),
+                    :first
+                )
+            order by close_time
+            """,
+            {
+                "symbol": symbol,
+                "interval": interval,
+                "first": timestamps[0],
+                "last": timestamps[-1],
+            },
+        )
+        rows = cursor.fetchall()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return {}
+    finally:
+        cursor.close()
+
+    close_times = [row[0] for row in rows]
+    prices = {}
+
+    for timestamp in timestamps:
+        index = bisect_right(close_times, timestamp)
+        if index:
+            prices[timestamp] = Decimal(rows[index - 1][1])
+
+    return prices
+
+
+def get_daily_amount_changes(
+    connection: Connection,
+) -> List[Tuple[int, str, float]]:
+    """
+    Returns the net balance change of every asset per day as
+    (day, asset, amount) rows, where day is the number of days since the
+    epoch and sold amounts (including fees) count as negative.
+    The changes are kept up to date on insert, see init_db.
+    """
+    cursor = connection.cursor()
+    # Plain tuples are much cheaper to build than sqlite3.Row objects.
+    cursor.row_factory = None
+    try:
+        cursor.execute("select day, asset, amount from daily_amount_changes")
+        return cursor.fetchall()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
+    finally:
+        cursor.close()
+
+
+def get_closes(
+    connection: Connection, interval: str
+) -> List[Tuple[str, int, float]]:
+    """
+    Returns the (symbol, open_time, close) of every stored candle of the
+    given interval.
+    """
+    cursor = connection.cursor()
+    # Plain tuples are much cheaper to build than sqlite3.Row objects.
+    cursor.row_factory = None
+    try:
+        cursor.execute(
+            """
+            select symbol, open_time, cast(close as real)
+            from klines
+            where interval = ?
+            """,
+            (interval,),
+        )
+        return cursor.fetchall()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return []
+    finally:
+        cursor.close()
@@ -0,0 +1,173 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from typing import Any, Callable
+
+from db import database
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Exception | None):
+    if future.cancelled():
+        return
+
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _log_error(future: asyncio.Future):
+    # Writes that are only submitted are never awaited, so their errors
+    # would otherwise go unnoticed.
+    if not future.cancelled() and future.exception():
+        print(f"An error occurred: {future.exception()}")
+
+
+def _flush(_connection):
+    pass
+
+
+class Storage:
+    """
+    Async facade over the SQLite database, so the event loop never blocks
+    on disk I/O.
+
+    Writes are queued to a single writer thread that owns the write
+    connection. It drains everything queued so far and commits it as one
+    batch. Reads run on a small pool of read-only connections in an
+    executor.
+
+    The functions passed to write, submit and read are the ones from
+    database, they receive the connection as their first argument.
+
+    A read-only storage starts no writer, so it never creates or changes
+    the database.
+    """
+
+    def __init__(
+        self,
+        path: str = database.DB_PATH,
+        readers: int = 2,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers,
+            thread_name_prefix="db-reader",
+            initializer=self._open_reader,
+        )
+        self._writer = None
+
+        if not read_only:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="db-writer", daemon=True
+            )
+            self._writer.start()
+
+    def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """
+        Queues a write without waiting for it.
+        The returned future resolves once the write is committed.
+        """
+        if self._writer is None:
+            raise RuntimeError("The storage is read-only")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(_log_error)
+        self._queue.put((fn, args, future, loop))
+        return future
+
+    async def write(self, fn: Callable, *args) -> Any:
+        return await self.submit(fn, *args)
+
+    async def flush(self) -> None:
+        """
+        Waits until every write queued so far is committed.
+        """
+        await self.submit(_flush)
+
+    async def read(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._read, fn, args)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            # The writer commits everything queued before stopping.
+            self._queue.put(None)
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._writer.join)
+
+        self._readers.shutdown()
+
+    def _open_reader(self):
+        self._local.connection = database.connect(self.path, read_only=True)
+
+    def _read(self, fn: Callable, args) -> Any:
+        return fn(self._local.connection, *args)
+
+    def _write_loop(self):
+        # On failure every write is resolved with the error, instead of the
+        # thread dying and leaving the queued futures pending forever.
+        connection = None
+        connection_error = None
+
+        try:
+            connection = database.connect(self.path)
+        except Exception as e:
+            connection_error = e
+
+        running = True
+
+        while running:
+            batch = [self._queue.get()]
+
+            # Drain whatever else is queued so it is committed together.
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            if connection is None:
+                results = [
+                    (future, loop, None, connection_error)
+                    for _, _, future, loop in batch
+                ]
+            else:
+                results = self._write_batch(connection, batch)
+
+            for future, loop, result, error in results:
+                loop.call_soon_threadsafe(_resolve, future, result, error)
+
+        if connection is not None:
+            connection.close()
+
+    def _write_batch(self, connection, batch) -> list:
+        results = []
+
+        for fn, args, future, loop in batch:
+            try:
+                results.append((future, loop, fn(connection, *args), None))
+            except Exception as e:
+                results.append((future, loop, None, e))
+
+        try:
+            connection.commit()
+        except Exception as e:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+
+            return [(future, loop, None, e) for future, loop, _, _ in results]
+
+        return results
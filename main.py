@@ -1,52 +1,139 @@
-import aiohttp
 import asyncio
-import os
+from argparse import Namespace
+from datetime import timedelta
 
-from api import BinanceApi
-from db import database
-from service import BinanceService, CalculationService
 from cli import args_parser
-from dotenv import load_dotenv
+from db import database
+from db.storage import Storage
+from util import str_to_datetime
 
-load_dotenv()
+# The HTTP stack (aiohttp, dotenv) and the services are imported inside
+# the commands that need them, so offline commands start fast.
 
-API_KEY = str(os.getenv("API_KEY"))
-API_SECRET = str(os.getenv("API_SECRET"))
 
+def _create_binance_api(session):
+    import os
 
-# def get_all_tx(period: int, days_interval: int):
-#     connection = init_db()
+    from dotenv import load_dotenv
 
-#     rows = get_all_transactions(connection)
-#     hashed_rows = get_rows_hashed(rows)
+    from api import BinanceApi, ResponseCache
 
-#     get_spot_tx(connection, hashed_rows, "SOLUSDT", period, days_interval)
-#     # print("Getting Auto-Ivest transactions...")
-#     # get_auto_invest_tx(connection, hashed_rows, period, days_interval)
+    load_dotenv()
 
-#     # print("Getting Convert transactions...")
-#     # get_convert_tx(connection, hashed_rows, period, days_interval)
+    return BinanceApi(
+        str(os.getenv("API_KEY")),
+        str(os.getenv("API_SECRET")),
+        session,
+        ResponseCache(),
+    )
 
-#     connection.close()
 
+async def plan(args: Namespace, storage: Storage):
+    from service import PlanService
 
-async def main():
-    database.init_db()
+    # The API is only used to look up the response cache, not to request.
+    plan_service = PlanService(
+        _create_binance_api(None),
+        storage,
+        args.period,
+        args.days_interval,
+        args.latency,
+    )
+    plan_service.print_plan(await plan_service.plan_sync(args.klines_interval))
 
-    args = args_parser()
-    if not args:
+
+async def sync(args: Namespace, storage: Storage):
+    if args.dry_run:
+        await plan(args, storage)
         return
-    (period, days_interval) = args
-    print(period, days_interval)
+
+    import aiohttp
+
+    from service import BinanceService
+
+    print(args.period, args.days_interval)
 
     async with aiohttp.ClientSession() as session:
-        binance_api = BinanceApi(API_KEY, API_SECRET, session)
-        binance_service = BinanceService(binance_api, period, days_interval)
-        calculation_service = CalculationService(binance_service)
+        binance_api = _create_binance_api(session)
+        binance_service = BinanceService(
+            binance_api, storage, args.period, args.days_interval
+        )
 
         await binance_service.download_transactions()
+        await binance_service.download_klines(args.klines_interval)
+
+
+async def report(args: Namespace, storage: Storage):
+    from service import CalculationService
+
+    if args.at:
+        end_of_day = str_to_datetime(args.at) + timedelta(days=1)
+        timestamp = int(end_of_day.timestamp() * 1000) - 1
+
+        calculation_service = CalculationService(None, storage)
+        await calculation_service.calculate_portfolio_value(
+            timestamp, args.klines_interval
+        )
+        return
+
+    if args.offline:
+        from service import CachedPriceService
+
+        calculation_service = CalculationService(
+            CachedPriceService(storage, args.klines_interval), storage
+        )
+        await calculation_service.calculate_average_prices()
+        return
 
+    import aiohttp
+
+    from service import BinanceService
+
+    async with aiohttp.ClientSession() as session:
+        binance_api = _create_binance_api(session)
+        calculation_service = CalculationService(
+            BinanceService(binance_api, storage), storage
+        )
         await calculation_service.calculate_average_prices()
 
 
-asyncio.run(main())
+async def export(args: Namespace, storage: Storage):
+    from service import PortfolioService
+
+    portfolio_series = await PortfolioService(
+        storage
+    ).calculate_daily_values(args.klines_interval)
+    if not portfolio_series:
+        print("No transactions to export")
+        return
+
+    portfolio_series.to_csv(args.output)
+    print(f"Exported {len(portfolio_series.dates)} days to {args.output}")
+
+
+COMMANDS = {
+    "sync": sync,
+    "plan": plan,
+    "report": report,
+    "export": export,
+}
+
+
+async def main():
+    args = args_parser()
+
+    # A plan only reads, it never creates or migrates the database.
+    read_only = args.command == "plan" or getattr(args, "dry_run", False)
+    storage = Storage(read_only=read_only)
+
+    try:
+        if not read_only:
+            await storage.write(database.init_db)
+
+        await COMMANDS[args.command](args, storage)
+    finally:
+        await storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
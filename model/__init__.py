@@ -1 +1,4 @@
+from .kline import Kline
+from .portfolio_series import PortfolioSeries
+from .request_plan import RequestPlan
 from .transaction import Transaction
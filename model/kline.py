@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Tuple
+
+
+@dataclass
+class Kline:
+    symbol: str
+    interval: str
+    open_time: int
+    close_time: int
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    volume: Decimal
+
+    @classmethod
+    def from_api_row(cls, symbol: str, interval: str, row: list):
+        return cls(
+            symbol=symbol,
+            interval=interval,
+            open_time=int(row[0]),
+            close_time=int(row[6]),
+            open=Decimal(row[1]),
+            high=Decimal(row[2]),
+            low=Decimal(row[3]),
+            close=Decimal(row[4]),
+            volume=Decimal(row[5]),
+        )
+
+    def to_db_row(self) -> Tuple:
+        return (
+            self.symbol,
+            self.interval,
+            self.open_time,
+            self.close_time,
+            str(self.open),
+            str(self.high),
+            str(self.low),
+            str(self.close),
+            str(self.volume),
+        )
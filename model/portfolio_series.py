@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+@dataclass
+class PortfolioSeries:
+    """
+    Dense date x asset matrices of the daily holdings, USD close prices and
+    USD values. Prices and values are NaN where no price is known yet, and
+    negative holdings are valued at 0.
+    """
+
+    dates: np.ndarray
+    assets: List[str]
+    holdings: np.ndarray
+    prices: np.ndarray
+    values: np.ndarray
+    totals: np.ndarray
+
+    def to_csv(self, path: str):
+        """
+        Writes the daily USD value of every asset and their total.
+        """
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["date", *self.assets, "total"])
+
+            for date, row, total in zip(
+                self.dates.astype(str).tolist(),
+                self.values.tolist(),
+                self.totals.tolist(),
+            ):
+                writer.writerow([date, *row, total])
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class RequestPlan:
+    stage: str
+    pool: str
+    requests: int
+    weight: int
+    batches: int
+    duration: float
@@ -56,19 +56,37 @@ class Transaction:
             fee=Decimal(row["fee"]),
         )
 
-    # TODO: fix tx info
     @classmethod
-    def from_spot_tx(cls, tx: dict):
+    def from_spot_tx(cls, tx: dict, base_asset: str, quote_asset: str):
+        base_amount = Decimal(tx["qty"])
+        quote_amount = Decimal(tx["quoteQty"])
+        commission = Decimal(tx["commission"])
+
+        if tx["isBuyer"]:
+            s_asset, s_amount = quote_asset, quote_amount
+            b_asset, b_amount = base_asset, base_amount
+        else:
+            s_asset, s_amount = base_asset, base_amount
+            b_asset, b_amount = quote_asset, quote_amount
+
+        # A commission in the bought asset lowers the received amount, one
+        # in the sold asset is a fee. Other ones (e.g. BNB) are not tracked.
+        fee = Decimal("0")
+        if tx["commissionAsset"] == b_asset:
+            b_amount -= commission
+        elif tx["commissionAsset"] == s_asset:
+            fee = commission
+
         return cls(
             binance_id=tx["id"],
-            timestamp=tx["transactionDateTime"],
-            s_asset=tx["sourceAsset"],
-            s_amount=tx["sourceAssetAmount"],
-            b_asset=tx["targetAsset"],
-            b_amount=tx["targetAssetAmount"],
-            price=tx["executionPrice"],
-            tx_type="BUY",
-            fee=tx["transactionFee"],
+            timestamp=tx["time"],
+            s_asset=s_asset,
+            s_amount=s_amount,
+            b_asset=b_asset,
+            b_amount=b_amount,
+            price=Decimal(tx["price"]),
+            tx_type="BUY" if tx["isBuyer"] else "SELL",
+            fee=fee,
         )
 
     def to_db_row(self) -> Tuple:
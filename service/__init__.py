@@ -1,2 +1,18 @@
-from .binance_service import BinanceService
-from .calculation_service import CalculationService
+from importlib import import_module
+
+# Services are imported on first use, so commands that never touch the
+# network do not pay for importing the HTTP stack (or NumPy).
+_SERVICES = {
+    "BinanceService": ".binance_service",
+    "CachedPriceService": ".cached_price_service",
+    "CalculationService": ".calculation_service",
+    "PlanService": ".plan_service",
+    "PortfolioService": ".portfolio_service",
+}
+
+
+def __getattr__(name: str):
+    if name not in _SERVICES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(import_module(_SERVICES[name], __name__), name)
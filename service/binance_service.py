@@ -1,27 +1,49 @@
+import asyncio
+from collections import defaultdict
 from decimal import Decimal
-from typing import List
+from typing import Iterable, List
 
 from api import BinanceApi, RateLimiter
 from constant import (
     API_RATE_LIMIT,
     SAPI_IP_RATE_LIMIT,
     SAPI_UID_RATE_LIMIT,
+    ACCOUNT_WEIGHT_IP,
     AUTO_INVEST_HISTORY_WEIGHT_IP,
     AVG_PRICE_WEIGHT_IP,
     CONVERT_TRADE_FLOW_WEIGHT_UID,
+    EXCHANGE_INFO_TTL,
+    EXCHANGE_INFO_WEIGHT_IP,
+    KLINES_WEIGHT_IP,
+    MY_TRADES_LIMIT,
     MY_TRADES_WEIGHT_IP,
 )
 from db import database
-from model import Transaction
-from util import determine_start_end_times
+from db.storage import Storage
+from model import Kline, Transaction
+from util import (
+    Symbols,
+    determine_kline_pages,
+    determine_start_end_times,
+    determine_timestamp_now,
+    is_usd_asset,
+    read_exchange_symbols,
+    select_symbols,
+    usdt_symbol,
+    write_exchange_symbols,
+)
 
 
 class BinanceService:
     def __init__(
-        self, binance_api: BinanceApi, period: int, days_interval: int
+        self,
+        binance_api: BinanceApi,
+        storage: Storage,
+        period: int = 0,
+        days_interval: int = 1,
     ) -> None:
         self.binance_api = binance_api
-        self.spot_times = determine_start_end_times(period, 1)
+        self.storage = storage
         self.auto_invest_times = (
             self.convert_times
         ) = determine_start_end_times(period, days_interval)
@@ -30,12 +52,175 @@ class BinanceService:
         self.sapi_uid_rate_limiter = RateLimiter(SAPI_UID_RATE_LIMIT, 60)
 
     async def download_transactions(self) -> None:
-        transactions = []
+        # Writes are only queued, the downloads never wait on the disk.
+        self.storage.submit(
+            database.inset_new_transactions,
+            await self._get_auto_invest_transactions(),
+        )
+        self.storage.submit(
+            database.inset_new_transactions,
+            await self._get_convert_transactions(),
+        )
+        self.storage.submit(
+            database.inset_new_transactions,
+            await self._get_spot_transactions(
+                await self.discover_spot_symbols()
+            ),
+        )
+
+    async def discover_spot_symbols(self) -> Symbols:
+        """
+        Returns the symbols to sync spot trades for: the pairs of the
+        exchange info whose base and quote asset the account holds or has
+        held, according to its balances and the stored transactions.
+        The exchange info is cached on disk for EXCHANGE_INFO_TTL seconds.
+
+        When the exchange info cannot be downloaded the expired cache is
+        used, and when the account cannot be downloaded only the stored
+        transactions are used.
+        """
+        symbols = await asyncio.to_thread(
+            read_exchange_symbols, EXCHANGE_INFO_TTL
+        )
+
+        if symbols is None:
+            await self.api_rate_limiter.add_task(
+                self.binance_api.get_exchange_info(),
+                EXCHANGE_INFO_WEIGHT_IP,
+            )
+
+        await self.api_rate_limiter.add_task(
+            self.binance_api.get_account(), ACCOUNT_WEIGHT_IP
+        )
+
+        await self.api_rate_limiter.execute_tasks()
 
-        transactions.extend(await self._get_auto_invest_transactions())
-        transactions.extend(await self._get_convert_transactions())
+        results = self.api_rate_limiter.get_results()
+        account = results[-1]
 
-        database.inset_new_transactions(transactions)
+        if symbols is None:
+            if results[0]:
+                symbols = await asyncio.to_thread(
+                    write_exchange_symbols, results[0]
+                )
+            else:
+                symbols = await asyncio.to_thread(read_exchange_symbols)
+
+        if symbols is None:
+            print("No exchange info, spot trades are not synced")
+            return {}
+
+        # The assets are read from the transactions that may still be queued.
+        await self.storage.flush()
+
+        assets = set(await self.storage.read(database.get_all_unique_assets))
+
+        for balance in account["balances"] if account else []:
+            asset = balance["asset"]
+            assets.add(asset)
+
+            # Simple Earn positions are listed as LD<asset>.
+            if asset.startswith("LD"):
+                assets.add(asset[2:])
+
+        return select_symbols(symbols, assets)
+
+    async def download_klines(self, interval: str = "1d") -> None:
+        """
+        Backfills the USDT klines of every asset found in the transactions,
+        from the first transaction until now.
+        """
+        # The assets are read from the transactions that may still be queued.
+        await self.storage.flush()
+
+        start_time = await self.storage.read(
+            database.get_first_transaction_timestamp
+        )
+        if start_time is None:
+            return
+
+        assets = [
+            asset
+            for asset in await self.storage.read(
+                database.get_all_unique_assets
+            )
+            if not is_usd_asset(asset)
+        ]
+
+        await self.download_asset_klines(
+            assets, interval, start_time, determine_timestamp_now()
+        )
+
+    async def download_asset_klines(
+        self,
+        assets: Iterable[str],
+        interval: str,
+        start_time: int,
+        end_time: int,
+    ) -> None:
+        """
+        Downloads the klines of the given assets in pages of KLINES_LIMIT
+        candles. Ranges that are already stored are never fetched again and
+        only closed candles are stored, as those can no longer change.
+        """
+        pages = []
+
+        for asset in assets:
+            symbol = usdt_symbol(asset)
+            covered = await self.storage.read(
+                database.get_kline_ranges, symbol, interval
+            )
+
+            for page_start, page_end in determine_kline_pages(
+                start_time, end_time, interval, covered
+            ):
+                pages.append((symbol, page_start, page_end))
+
+                cached = await self.binance_api.is_klines_cached(
+                    symbol, interval, page_start, page_end
+                )
+                await self.api_rate_limiter.add_task(
+                    self.binance_api.get_klines(
+                        symbol, interval, page_start, page_end
+                    ),
+                    0 if cached else KLINES_WEIGHT_IP,
+                )
+
+        await self.api_rate_limiter.execute_tasks()
+
+        klines = []
+        fetched_ranges = defaultdict(list)
+        now = determine_timestamp_now()
+
+        for (symbol, page_start, page_end), result in zip(
+            pages, self.api_rate_limiter.get_results()
+        ):
+            if result is None:
+                continue
+
+            page_klines = [
+                Kline.from_api_row(symbol, interval, row) for row in result
+            ]
+
+            # A candle that is still open can change, so it is neither
+            # stored nor marked covered and is fetched again next time.
+            for kline in page_klines:
+                if kline.close_time >= now:
+                    page_end = min(page_end, kline.open_time - 1)
+
+            klines.extend(
+                kline for kline in page_klines if kline.close_time < now
+            )
+
+            if page_end >= page_start:
+                fetched_ranges[symbol].append((page_start, page_end))
+
+        self.storage.submit(database.insert_klines, klines)
+
+        for symbol, ranges in fetched_ranges.items():
+            self.storage.submit(
+                database.add_kline_ranges, symbol, interval, ranges
+            )
 
     async def get_asset_usdt_average_price(self, asset: str) -> Decimal:
         await self.api_rate_limiter.add_task(
@@ -55,9 +240,12 @@ class BinanceService:
         transactions = []
 
         for start_time, end_time in self.auto_invest_times:
+            cached = await self.binance_api.is_auto_invest_tx_cached(
+                start_time, end_time
+            )
             await self.sapi_ip_rate_limiter.add_task(
                 self.binance_api.get_auto_invest_tx(start_time, end_time),
-                AUTO_INVEST_HISTORY_WEIGHT_IP,
+                0 if cached else AUTO_INVEST_HISTORY_WEIGHT_IP,
             )
 
         await self.sapi_ip_rate_limiter.execute_tasks()
@@ -71,13 +259,63 @@ class BinanceService:
             if transaction["transactionStatus"] == "SUCCESS"
         ]
 
+    async def _get_spot_transactions(
+        self, symbols: Symbols
+    ) -> List[Transaction]:
+        """
+        Pages through the whole trade history of every symbol by trade id,
+        so the requests grow with the number of trades instead of the
+        length of the history. The symbols are paged in parallel.
+        """
+        transactions = []
+        from_ids = {symbol: 0 for symbol in symbols}
+
+        while from_ids:
+            requested_symbols = list(from_ids)
+
+            for symbol in requested_symbols:
+                cached = await self.binance_api.is_spot_tx_cached(
+                    symbol, from_ids[symbol]
+                )
+                await self.api_rate_limiter.add_task(
+                    self.binance_api.get_spot_tx(symbol, from_ids[symbol]),
+                    0 if cached else MY_TRADES_WEIGHT_IP,
+                )
+
+            await self.api_rate_limiter.execute_tasks()
+
+            from_ids = {}
+
+            for symbol, result in zip(
+                requested_symbols, self.api_rate_limiter.get_results()
+            ):
+                if not result:
+                    continue
+
+                base_asset, quote_asset = symbols[symbol]
+                transactions.extend(
+                    Transaction.from_spot_tx(
+                        transaction, base_asset, quote_asset
+                    )
+                    for transaction in result
+                )
+
+                # A full page means there may be more trades after it.
+                if len(result) == MY_TRADES_LIMIT:
+                    from_ids[symbol] = result[-1]["id"] + 1
+
+        return transactions
+
     async def _get_convert_transactions(self) -> List[Transaction]:
         transactions = []
 
         for start_time, end_time in self.convert_times:
+            cached = await self.binance_api.is_convert_tx_cached(
+                start_time, end_time
+            )
             await self.sapi_uid_rate_limiter.add_task(
                 self.binance_api.get_convert_tx(start_time, end_time),
-                CONVERT_TRADE_FLOW_WEIGHT_UID,
+                0 if cached else CONVERT_TRADE_FLOW_WEIGHT_UID,
             )
 
         await self.sapi_uid_rate_limiter.execute_tasks()
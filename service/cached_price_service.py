@@ -0,0 +1,31 @@
+from decimal import Decimal
+from typing import Optional
+
+from db import database
+from db.storage import Storage
+from util import determine_timestamp_now, usdt_symbol
+
+
+class CachedPriceService:
+    """
+    Serves the latest locally stored close instead of requesting the
+    current price, so reports can run without any network access.
+    """
+
+    def __init__(self, storage: Storage, interval: str = "1d") -> None:
+        self.storage = storage
+        self.interval = interval
+
+    async def get_asset_usdt_average_price(
+        self, asset: str
+    ) -> Optional[Decimal]:
+        timestamp = determine_timestamp_now()
+
+        prices = await self.storage.read(
+            database.get_prices_at,
+            usdt_symbol(asset),
+            self.interval,
+            [timestamp],
+        )
+
+        return prices.get(timestamp)
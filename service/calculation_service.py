@@ -1,17 +1,43 @@
+from collections import defaultdict
 from decimal import Decimal
 import json
+import sys
+from typing import Optional, Protocol
 
 from db import database
-from service import BinanceService
+from db.storage import Storage
+from util import is_usd_asset, usdt_symbol
+
+
+class PriceService(Protocol):
+    async def get_asset_usdt_average_price(
+        self, asset: str
+    ) -> Optional[Decimal]: ...
 
 
 class CalculationService:
-    def __init__(self, binance_service: BinanceService) -> None:
-        self.binance_service = binance_service
+    """
+    Prints its reports as JSON on stdout, so they can be piped into other
+    tools. Diagnostics go to stderr.
+
+    The price service is only used by calculate_average_prices,
+    calculate_portfolio_value reads the stored prices and takes None.
+    """
+
+    def __init__(
+        self, price_service: Optional[PriceService], storage: Storage
+    ) -> None:
+        self.price_service = price_service
+        self.storage = storage
 
     async def calculate_average_prices(self):
-        unique_assets = database.get_all_unique_assets()
-        transactions = database.get_all_transactions()
+        if self.price_service is None:
+            raise ValueError("The average prices need a price service")
+
+        unique_assets = await self.storage.read(
+            database.get_all_unique_assets
+        )
+        transactions = await self.storage.read(database.get_all_transactions)
 
         results = dict()
 
@@ -42,10 +68,14 @@ class CalculationService:
             avg_price = usd_spent / asset_amount
 
             current_price = (
-                await self.binance_service.get_asset_usdt_average_price(
+                await self.price_service.get_asset_usdt_average_price(
                     unique_asset
                 )
             )
+            if current_price is None:
+                print(f"No price for {unique_asset}", file=sys.stderr)
+                continue
+
             potential_profit_loss = (
                 asset_amount * current_price - asset_amount * avg_price
             )
@@ -59,3 +89,59 @@ class CalculationService:
             }
 
         print(json.dumps(results, indent=2))
+
+    async def calculate_portfolio_value(
+        self, timestamp: int, interval: str = "1d"
+    ):
+        """
+        Values the holdings at the given timestamp (in milliseconds) using
+        only the locally stored klines, so no requests are made.
+        """
+        holdings = defaultdict(Decimal)
+
+        for tx in await self.storage.read(database.get_all_transactions):
+            if int(tx.timestamp) > timestamp:
+                continue
+
+            holdings[tx.b_asset] += tx.b_amount
+            holdings[tx.s_asset] -= tx.s_amount + tx.fee
+
+        results = dict()
+        total_value = Decimal(0)
+
+        for asset, asset_amount in holdings.items():
+            # Deposits are not recorded, so holdings can go negative. Like
+            # PortfolioService.calculate_daily_values, only positive
+            # holdings are valued.
+            if asset_amount <= Decimal(0):
+                continue
+
+            if is_usd_asset(asset):
+                price = Decimal(1)
+            else:
+                prices = await self.storage.read(
+                    database.get_prices_at,
+                    usdt_symbol(asset),
+                    interval,
+                    [timestamp],
+                )
+                if timestamp not in prices:
+                    print(
+                        f"No stored price for {asset} at {timestamp}",
+                        file=sys.stderr,
+                    )
+                    continue
+                price = prices[timestamp]
+
+            value = asset_amount * price
+            total_value += value
+
+            results[asset] = {
+                "asset_amount": str(asset_amount),
+                "price": str(price),
+                "value": str(value),
+            }
+
+        results["total_value"] = str(total_value)
+
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,265 @@
+import os
+from typing import Dict, List, Tuple
+
+from api import BinanceApi
+from constant import (
+    API_RATE_LIMIT,
+    SAPI_IP_RATE_LIMIT,
+    SAPI_UID_RATE_LIMIT,
+    ACCOUNT_WEIGHT_IP,
+    AUTO_INVEST_HISTORY_WEIGHT_IP,
+    CONVERT_TRADE_FLOW_WEIGHT_UID,
+    EXCHANGE_INFO_TTL,
+    EXCHANGE_INFO_WEIGHT_IP,
+    KLINES_WEIGHT_IP,
+    MY_TRADES_WEIGHT_IP,
+)
+from db import database
+from db.storage import Storage
+from model import RequestPlan
+from util import (
+    determine_kline_pages,
+    determine_start_end_times,
+    determine_timestamp_now,
+    is_usd_asset,
+    read_exchange_symbols,
+    select_symbols,
+    usdt_symbol,
+)
+
+# (rate limit, time window in seconds) of every rate limiter pool
+POOLS: Dict[str, Tuple[int, int]] = {
+    "api": (API_RATE_LIMIT, 60),
+    "sapi_ip": (SAPI_IP_RATE_LIMIT, 60),
+    "sapi_uid": (SAPI_UID_RATE_LIMIT, 60),
+}
+
+
+class PlanService:
+    """
+    Expands a sync into the requests it would make and simulates the rate
+    limiter pools, without any network access. Requests the response cache
+    would serve are not counted, as a sync does not charge them either.
+    """
+
+    def __init__(
+        self,
+        binance_api: BinanceApi,
+        storage: Storage,
+        period: int,
+        days_interval: int,
+        latency: float = 0.5,
+    ) -> None:
+        self.binance_api = binance_api
+        self.storage = storage
+        self.auto_invest_times = (
+            self.convert_times
+        ) = determine_start_end_times(period, days_interval)
+        self.latency = latency
+        self.clock = 0.0
+        self.pool_states: Dict[str, Dict] = {}
+
+    async def plan_sync(
+        self, klines_interval: str = "1d"
+    ) -> List[RequestPlan]:
+        self.clock = 0.0
+        self.pool_states = {
+            pool: {"weight": 0, "window_start": 0.0} for pool in POOLS
+        }
+
+        return [
+            self._simulate(
+                "auto-invest",
+                "sapi_ip",
+                [AUTO_INVEST_HISTORY_WEIGHT_IP]
+                * await self._count_uncached_windows(
+                    self.binance_api.is_auto_invest_tx_cached,
+                    self.auto_invest_times,
+                ),
+            ),
+            self._simulate(
+                "convert",
+                "sapi_uid",
+                [CONVERT_TRADE_FLOW_WEIGHT_UID]
+                * await self._count_uncached_windows(
+                    self.binance_api.is_convert_tx_cached,
+                    self.convert_times,
+                ),
+            ),
+            self._simulate(
+                "symbols",
+                "api",
+                self._determine_symbol_discovery_weights(),
+            ),
+            self._simulate(
+                "spot",
+                "api",
+                await self._determine_spot_weights(),
+            ),
+            self._simulate(
+                "klines",
+                "api",
+                [KLINES_WEIGHT_IP] * await self._count_kline_pages(
+                    klines_interval
+                ),
+            ),
+        ]
+
+    def print_plan(self, plans: List[RequestPlan]):
+        print(
+            f"{'stage':<12}{'pool':<10}{'requests':>10}"
+            f"{'weight':>12}{'batches':>9}{'time (s)':>10}"
+        )
+
+        for plan in plans:
+            print(
+                f"{plan.stage:<12}{plan.pool:<10}{plan.requests:>10}"
+                f"{plan.weight:>12}{plan.batches:>9}{plan.duration:>10.1f}"
+            )
+
+        print()
+
+        for pool, (rate_limit, time_window) in POOLS.items():
+            weight = sum(plan.weight for plan in plans if plan.pool == pool)
+            print(f"{pool} weight: {weight} ({rate_limit}/{time_window}s)")
+
+        print(f"Requests: {sum(plan.requests for plan in plans)}")
+        print(
+            "Projected time: "
+            f"{sum(plan.duration for plan in plans):.1f}s"
+            f" (assuming {self.latency}s per request batch)"
+        )
+
+    async def _count_uncached_windows(
+        self, is_cached, times: List[Tuple[int, int]]
+    ) -> int:
+        count = 0
+
+        for start_time, end_time in times:
+            if not await is_cached(start_time, end_time):
+                count += 1
+
+        return count
+
+    def _determine_symbol_discovery_weights(self) -> List[int]:
+        weights = [ACCOUNT_WEIGHT_IP]
+
+        if read_exchange_symbols(EXCHANGE_INFO_TTL) is None:
+            weights.append(EXCHANGE_INFO_WEIGHT_IP)
+
+        return weights
+
+    async def _determine_spot_weights(self) -> List[int]:
+        """
+        Expands the spot trade requests of the symbols selected from the
+        cached exchange info and the stored transactions. The balances are
+        not known offline, so assets only found there are not included.
+
+        Trades are paged by id, one request per MY_TRADES_LIMIT trades of a
+        symbol. Full settled pages are served from the response cache, so
+        after the first sync only the last page of a symbol is requested.
+        The trade counts are not known offline, so one page per symbol is
+        counted.
+        """
+        symbols = read_exchange_symbols()
+        if symbols is None:
+            print("No cached exchange info, spot trades are not included")
+            return []
+
+        assets = await self._read_stored_assets()
+        symbol_count = len(select_symbols(symbols, assets))
+
+        return [MY_TRADES_WEIGHT_IP] * symbol_count
+
+    async def _count_kline_pages(self, interval: str) -> int:
+        """
+        Counts the kline pages of the assets already stored. On a first sync
+        the assets are not known yet, so these are not included.
+        """
+        if not os.path.exists(self.storage.path):
+            return 0
+
+        start_time = await self.storage.read(
+            database.get_first_transaction_timestamp
+        )
+        if start_time is None:
+            return 0
+
+        end_time = determine_timestamp_now()
+        count = 0
+
+        for asset in await self.storage.read(database.get_all_unique_assets):
+            if is_usd_asset(asset):
+                continue
+
+            symbol = usdt_symbol(asset)
+            covered = await self.storage.read(
+                database.get_kline_ranges, symbol, interval
+            )
+
+            for page_start, page_end in determine_kline_pages(
+                start_time, end_time, interval, covered
+            ):
+                if not await self.binance_api.is_klines_cached(
+                    symbol, interval, page_start, page_end
+                ):
+                    count += 1
+
+        return count
+
+    async def _read_stored_assets(self) -> List[str]:
+        # The plan opens the database read-only, before the first sync
+        # there is none.
+        if not os.path.exists(self.storage.path):
+            return []
+
+        return await self.storage.read(database.get_all_unique_assets)
+
+    def _simulate(self, stage: str, pool: str, weights: List[int]):
+        """
+        Replays the requests through the same logic as RateLimiter.add_task:
+        requests are gathered until the weight budget of the pool is used
+        up, then the batch runs and the next one waits for the time window
+        to pass. The pools keep their state across stages, like the rate
+        limiters of a sync do.
+        """
+        rate_limit, time_window = POOLS[pool]
+        state = self.pool_states[pool]
+
+        start_time = self.clock
+        batches = 0
+        pending = False
+
+        for weight in weights:
+            if (
+                state["weight"] + weight > rate_limit
+                or self.clock - state["window_start"] >= time_window
+            ):
+                if pending:
+                    batches += 1
+                    self.clock += self.latency
+                    pending = False
+
+                if state["weight"] + weight > rate_limit:
+                    self.clock = max(
+                        self.clock, state["window_start"] + time_window
+                    )
+
+                state["window_start"] = self.clock
+                state["weight"] = 0
+
+            state["weight"] += weight
+            pending = True
+
+        if pending:
+            batches += 1
+            self.clock += self.latency
+
+        return RequestPlan(
+            stage=stage,
+            pool=pool,
+            requests=len(weights),
+            weight=sum(weights),
+            batches=batches,
+            duration=self.clock - start_time,
+        )
@@ -0,0 +1,127 @@
+from typing import Optional
+
+import numpy as np
+
+from db import database
+from db.storage import Storage
+from model import PortfolioSeries
+from util import determine_timestamp_now, is_usd_asset, usdt_symbol
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class PortfolioService:
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    async def calculate_daily_values(
+        self, interval: str = "1d"
+    ) -> Optional[PortfolioSeries]:
+        """
+        Computes the end-of-day holdings and USD value of every asset from
+        the first transaction until today, using the last stored close of
+        every day of the given kline interval.
+        All the work is done on whole date x asset arrays.
+        """
+        rows = await self.storage.read(database.get_daily_amount_changes)
+        if not rows:
+            return None
+
+        days, row_assets, amounts = zip(*rows)
+
+        asset_columns = {}
+        asset_indices = np.fromiter(
+            (
+                asset_columns.setdefault(asset, len(asset_columns))
+                for asset in row_assets
+            ),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        assets = list(asset_columns)
+        asset_count = len(assets)
+
+        days = np.fromiter(days, dtype=np.int64, count=len(rows))
+        amounts = np.fromiter(amounts, dtype=np.float64, count=len(rows))
+
+        first_day = int(days.min())
+        last_day = max(int(days.max()), determine_timestamp_now() // DAY_MS)
+        day_count = last_day - first_day + 1
+
+        changes = np.bincount(
+            (days - first_day) * asset_count + asset_indices,
+            weights=amounts,
+            minlength=day_count * asset_count,
+        ).reshape(day_count, asset_count)
+        holdings = np.cumsum(changes, axis=0)
+
+        closes = await self.storage.read(database.get_closes, interval)
+        prices = self._build_price_matrix(
+            closes, assets, asset_columns, first_day, day_count
+        )
+        # Deposits are not recorded, so holdings can go negative. Like
+        # CalculationService.calculate_portfolio_value, only positive
+        # holdings are valued.
+        values = np.maximum(holdings, 0) * prices
+
+        dates = np.arange(first_day, first_day + day_count).astype(
+            "datetime64[D]"
+        )
+
+        return PortfolioSeries(
+            dates=dates,
+            assets=assets,
+            holdings=holdings,
+            prices=prices,
+            values=values,
+            totals=np.nansum(values, axis=1),
+        )
+
+    def _build_price_matrix(
+        self,
+        closes,
+        assets,
+        asset_columns,
+        first_day: int,
+        day_count: int,
+    ) -> np.ndarray:
+        """
+        Places the last close of every day on the day grid and
+        forward-fills the days without a candle with the last known close.
+        """
+        prices = np.full((day_count, len(assets)), np.nan)
+
+        symbol_columns = {
+            usdt_symbol(asset): column
+            for asset, column in asset_columns.items()
+            if not is_usd_asset(asset)
+        }
+        closes = [
+            (symbol_columns[symbol], open_time, close)
+            for symbol, open_time, close in closes
+            if symbol in symbol_columns
+        ]
+
+        if closes:
+            columns, open_times, close_prices = (
+                np.array(values) for values in zip(*closes)
+            )
+            # Sorted by open time, so the last candle of a day is assigned
+            # last and its close is kept.
+            order = np.argsort(open_times, kind="stable")
+            columns = columns[order]
+            close_prices = close_prices[order]
+            days = open_times[order] // DAY_MS - first_day
+            in_range = (days >= 0) & (days < day_count)
+            prices[days[in_range], columns[in_range]] = close_prices[in_range]
+
+        for asset, column in asset_columns.items():
+            if is_usd_asset(asset):
+                prices[:, column] = 1.0
+
+        last_known = np.where(
+            np.isnan(prices), 0, np.arange(day_count)[:, None]
+        )
+        np.maximum.accumulate(last_known, axis=0, out=last_known)
+
+        return prices[last_known, np.arange(len(assets))]
@@ -1,10 +1,21 @@
 from .api_utils import add_signature
+from .asset_utils import is_usd_asset, usdt_symbol
 from .hash_utils import hash_values
+from .symbol_utils import (
+    Symbols,
+    read_exchange_symbols,
+    select_symbols,
+    write_exchange_symbols,
+)
 from .time_utils import (
     determine_days_interval,
+    determine_kline_pages,
+    determine_missing_ranges,
     determine_period,
     determine_start_end_times,
     determine_timestamp_now,
     determine_timestamp_start_time,
+    interval_to_milliseconds,
+    merge_ranges,
     str_to_datetime,
 )
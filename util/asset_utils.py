@@ -0,0 +1,18 @@
+def is_usd_asset(asset: str) -> bool:
+    """
+    Check whether an asset is a USD (stable)coin valued at 1 USD.
+
+    :param asset: Asset ticker, e.g. BTC or USDT.
+    :return: True if the asset is pegged to USD.
+    """
+    return "USD" in asset
+
+
+def usdt_symbol(asset: str) -> str:
+    """
+    Build the USDT trading pair symbol of an asset.
+
+    :param asset: Asset ticker, e.g. BTC.
+    :return: Symbol of the asset quoted in USDT, e.g. BTCUSDT.
+    """
+    return f"{asset}USDT"
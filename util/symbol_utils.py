@@ -0,0 +1,78 @@
+import json
+import os
+from time import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from constant import EXCHANGE_INFO_CACHE_PATH
+
+# symbol -> (base asset, quote asset)
+Symbols = Dict[str, Tuple[str, str]]
+
+
+def read_exchange_symbols(
+    ttl: Optional[int] = None, path: str = EXCHANGE_INFO_CACHE_PATH
+) -> Optional[Symbols]:
+    """
+    Read the symbols of the cached exchange info.
+
+    :param ttl: Maximum age of the cache in seconds, None to ignore its age.
+    :param path: Path of the cache file.
+    :return: The cached symbols, or None if missing or expired.
+    """
+    try:
+        if ttl is not None and time() - os.path.getmtime(path) > ttl:
+            return None
+
+        with open(path) as file:
+            return {
+                symbol: (base_asset, quote_asset)
+                for symbol, base_asset, quote_asset in json.load(file)
+            }
+    except FileNotFoundError:
+        return None
+
+
+def write_exchange_symbols(
+    exchange_info: dict, path: str = EXCHANGE_INFO_CACHE_PATH
+) -> Symbols:
+    """
+    Cache the symbols of an exchange info response. Only the symbol, base
+    asset and quote asset are kept, the full response is several MB.
+
+    :param exchange_info: Response of the exchange info endpoint.
+    :param path: Path of the cache file.
+    :return: The cached symbols.
+    """
+    symbols = {
+        symbol["symbol"]: (symbol["baseAsset"], symbol["quoteAsset"])
+        for symbol in exchange_info["symbols"]
+    }
+
+    with open(path, "w") as file:
+        json.dump(
+            [
+                (symbol, base_asset, quote_asset)
+                for symbol, (base_asset, quote_asset) in symbols.items()
+            ],
+            file,
+        )
+
+    return symbols
+
+
+def select_symbols(symbols: Symbols, assets: Iterable[str]) -> Symbols:
+    """
+    Keep only the symbols whose base and quote asset were both held, as
+    only those can have been traded.
+
+    :param symbols: All the symbols of the exchange.
+    :param assets: The assets the account holds or has held.
+    :return: The symbols that need to be synced.
+    """
+    assets = set(assets)
+
+    return {
+        symbol: (base_asset, quote_asset)
+        for symbol, (base_asset, quote_asset) in symbols.items()
+        if base_asset in assets and quote_asset in assets
+    }
@@ -2,6 +2,8 @@ from datetime import datetime, timedelta
 from time import time
 from typing import List, Tuple
 
+from constant import KLINES_LIMIT
+
 
 def str_to_datetime(date_str: str) -> datetime:
     """
@@ -71,17 +73,139 @@ def determine_timestamp_start_time(end_time: int, days_interval: int) -> int:
 def determine_start_end_times(
     period: int, days_interval: int = 1
 ) -> List[Tuple[int, int]]:
+    """
+    Split the last period days into windows of days_interval days, newest
+    first.
+
+    Except for the current one, the windows are aligned to multiples of
+    days_interval days since the epoch. Their boundaries are the same on
+    every run, so closed windows can be served from the response cache.
+
+    :param period: Number of days to cover.
+    :param days_interval: Length of a window in days, at least 1 is used.
+    :return: (start, end) timestamps in milliseconds of every window.
+    """
+    # A period of 0 days (starting today) yields an interval of 0 days.
+    interval_ms = max(days_interval, 1) * 24 * 60 * 60 * 1000
+
     end_time = determine_timestamp_now()
-    start_time = determine_timestamp_start_time(end_time, days_interval)
+    first_time = determine_timestamp_start_time(end_time, period)
+    start_time = end_time // interval_ms * interval_ms
     times = [(start_time, end_time)]
 
-    while period > 0:
+    while start_time > first_time:
         end_time = start_time
-        start_time = determine_timestamp_start_time(end_time, days_interval)
+        start_time -= interval_ms
 
         times.append((start_time, end_time))
 
-        period -= days_interval
-        days_interval = determine_days_interval(days_interval, period)
-
     return times
+
+
+def interval_to_milliseconds(interval: str) -> int:
+    """
+    Convert a Binance kline interval (e.g. 1m, 4h, 1d, 1w) to milliseconds.
+
+    :param interval: Kline interval as accepted by the klines endpoint.
+    :return: Length of a single candle in milliseconds.
+    :raises ValueError: If the interval unit is not supported.
+    """
+    units = {
+        "s": 1000,
+        "m": 60 * 1000,
+        "h": 60 * 60 * 1000,
+        "d": 24 * 60 * 60 * 1000,
+        "w": 7 * 24 * 60 * 60 * 1000,
+    }
+
+    try:
+        return int(interval[:-1]) * units[interval[-1]]
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Unsupported kline interval: {interval}") from e
+
+
+def determine_missing_ranges(
+    start_time: int, end_time: int, covered: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+    """
+    Subtract the already covered ranges from [start_time, end_time].
+
+    :param start_time: Start of the requested range in milliseconds.
+    :param end_time: End of the requested range in milliseconds.
+    :param covered: Inclusive (start, end) ranges that are already stored.
+    :return: Sorted inclusive (start, end) ranges that still need fetching.
+    """
+    missing = []
+    cursor = start_time
+
+    for covered_start, covered_end in sorted(covered):
+        if covered_end < cursor:
+            continue
+        if covered_start > end_time:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start - 1))
+        cursor = max(cursor, covered_end + 1)
+
+    if cursor <= end_time:
+        missing.append((cursor, end_time))
+
+    return missing
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Merge overlapping or adjacent inclusive (start, end) ranges.
+
+    :param ranges: Inclusive ranges in milliseconds, in any order.
+    :return: Sorted, non-overlapping inclusive ranges.
+    """
+    merged: List[Tuple[int, int]] = []
+
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def determine_kline_pages(
+    start_time: int,
+    end_time: int,
+    interval: str,
+    covered: List[Tuple[int, int]],
+) -> List[Tuple[int, int]]:
+    """
+    Split the not yet covered part of [start_time, end_time] into pages of
+    at most KLINES_LIMIT candles. Only closed candles are included, as the
+    current one can still change. The candles of the interval must open on
+    multiples of its length since the epoch, see KLINES_INTERVALS.
+
+    :param start_time: Start of the requested range in milliseconds.
+    :param end_time: End of the requested range in milliseconds.
+    :param interval: Kline interval, e.g. 1d.
+    :param covered: Inclusive (start, end) ranges that are already stored.
+    :return: Inclusive (start, end) ranges, one per request.
+    """
+    interval_ms = interval_to_milliseconds(interval)
+    page_ms = KLINES_LIMIT * interval_ms
+
+    start_time = start_time // interval_ms * interval_ms
+    last_closed_time = determine_timestamp_now() // interval_ms * interval_ms
+    end_time = min(end_time, last_closed_time - 1)
+
+    pages = []
+
+    for missing_start, missing_end in determine_missing_ranges(
+        start_time, end_time, covered
+    ):
+        page_start = missing_start
+
+        while page_start <= missing_end:
+            page_end = min(page_start + page_ms - 1, missing_end)
+            pages.append((page_start, page_end))
+            page_start = page_end + 1
+
+    return pages